@@ -1,9 +1,14 @@
 import os
+import mmap
 import numpy as np
 from dotenv import load_dotenv
-import re
+from bisect import bisect_right
+from itertools import islice
+from concurrent.futures import ProcessPoolExecutor
 
-from langchain_community.document_loaders import DirectoryLoader, PDFMinerLoader, PyPDFLoader
+from pypdf import PdfReader
+from langchain_core.documents import Document
+from langchain_community.document_loaders import DirectoryLoader, PDFMinerLoader
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 
 load_dotenv()
@@ -11,108 +16,170 @@ load_dotenv()
 API_KEY = os.getenv('API_KEY')
 DATASET_PATH = os.getenv('DATASET_PATH')
 
+# Layout extraction separates columns with runs of 3 or more spaces
+_COLUMN_SEP = "   "
+
+# Pages parsed serially before the rest are spread across worker processes
+_PARALLEL_MIN_PAGES = 5000
+
+# Recipe type by page number: pages below each threshold belong to the matching label
+_PAGE_THRESHOLDS = [28, 51, 92, 110, 128, 135]
+_RECIPE_TYPES = [
+    "STARTERS & SALADS",
+    "LIGHT MEALS",
+    "MAIN MEALS",
+    "GOURMET DOGS",
+    "BURGERS",
+    "COLD SAUCES",
+    "DESSERT & BAKING",
+]
+
+
+def is_recipe_page(text):
+    """Check if page text contains both INGREDIENTS and METHOD sections"""
+    return "INGREDIENTS" in text and "METHOD" in text
+
 
 def load_pdf_documents(file_path):
-    loader = PyPDFLoader(file_path,
-                        mode='page',
-                        extract_images=True,
-                        extraction_mode='layout'
-                        )
-    documents = loader.load()
-    return documents
+    """
+    Lazily load recipe pages from a PDF
 
+    Each page is extracted once in layout mode and kept only if it looks like
+    a recipe. Images are not extracted since nothing downstream uses them.
+    The file is memory-mapped so the OS pages in PDF data on demand.
+    Page labels are parsed to integers once here for recipe categorization.
+    """
+    with open(file_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        reader = PdfReader(mm)
+        page_labels = reader.page_labels
 
-def split_into_chunks(documents):
-    recipe_chunks = []
+        for page_number, page in enumerate(reader.pages):
+            text = page.extract_text(extraction_mode='layout')
+            if not is_recipe_page(text):
+                continue
+
+            yield Document(
+                page_content=text,
+                metadata={
+                    "source": file_path,
+                    "page": page_number,
+                    "page_label": int(page_labels[page_number]),
+                },
+            )
+
+
+def _split_columns(line):
+    """Split a layout line into its left column and optional right column"""
+    idx = line.find(_COLUMN_SEP)
+    if idx < 0:
+        return line, None
     
-    for i, doc in enumerate(documents):
-        recipe_header = ""
-        serving_suggestion = ""
-        ingredients = ""
-        method = ""
-        chef_tip = ""
-        
-        text = doc.page_content
-        
-        # Skip pages with too little content
-        if len(text) < 50:
-            continue
-            
-        # Check if page contains both INGREDIENTS and METHOD sections
-        s1 = re.escape("INGREDIENTS")
-        s2 = re.escape("METHOD")
-        pattern_string = rf"(?=.*{s1})(?=.*{s2})"
-        pattern = re.compile(pattern_string)
-        if not pattern.search(text): 
+    # Skip the rest of the separator and drop any further columns
+    right = line[idx:].lstrip()
+    end = right.find(_COLUMN_SEP)
+    if end >= 0:
+        right = right[:end]
+    return line[:idx], right
+
+
+def _parse_page(doc):
+    """Parse a single page into a recipe chunk, or return None if it is not a recipe"""
+    text = doc.page_content
+    
+    # Skip short pages and pages without both INGREDIENTS and METHOD sections
+    # before doing any parsing or metadata work
+    if len(text) < 100 or not is_recipe_page(text):
+        return None
+    
+    header_parts = []
+    serving_parts = []
+    ingredient_parts = []
+    method_parts = []
+    
+    # Parse the page content
+    for line_idx, line in enumerate(text.split('\n')):
+        if line_idx >= 45:
+            break
+        if not line:
             continue
+        left, right = _split_columns(line)
         
-        # Parse the page content
-        for line_idx, line in enumerate(text.split('\n')):
-            line_parts = re.split(r'\s{3,}', line)
-            
-            # Extract header info from first 5 lines
-            if line_idx < 5 and line_parts != ['']:
-                recipe_header += line_parts[0] + " "
-                if len(line_parts) > 1:
-                    serving_suggestion += line_parts[1] + " "
-            
-            # Extract ingredients and method from remaining lines
-            elif line_idx >= 5 and line_idx < 45 and line_parts != ['']:
-                ingredients += line_parts[0] + "\n"
-                if len(line_parts) > 1:
-                    if re.search(":", line_parts[1]):
-                        method += "\n" + line_parts[1] + "\n"
-                    else:
-                        method += line_parts[1] + " "
-
-        # Clean up extracted content
-        ingredients = ingredients.replace("INGREDIENTS", "").strip()
+        # Extract header info from first 5 lines
+        if line_idx < 5:
+            header_parts.append(left)
+            if right is not None:
+                serving_parts.append(right)
         
-        # Extract chef's tip if present
-        method, separator, chef_tip = method.partition("CHEF'S TIP:")
-        method = method.replace("METHOD", "").strip()
-        if separator:
-            chef_tip = chef_tip.replace("\n", " ").strip()
-
-        # Add recipe-specific metadata
-        doc.metadata["recipe_name"] = recipe_header.strip()
-        doc.metadata["serving_suggestion"] = serving_suggestion.strip()
-
-        # Categorize recipe type by page number
-        page_label = int(doc.metadata["page_label"])
-        if page_label < 28:
-            doc.metadata["recipe_type"] = "STARTERS & SALADS"
-        elif page_label < 51:
-            doc.metadata["recipe_type"] = "LIGHT MEALS"
-        elif page_label < 92:
-            doc.metadata["recipe_type"] = "MAIN MEALS"
-        elif page_label < 110:
-            doc.metadata["recipe_type"] = "GOURMET DOGS"
-        elif page_label < 128:
-            doc.metadata["recipe_type"] = "BURGERS"
-        elif page_label >= 135:
-            doc.metadata["recipe_type"] = "DESSERT & BAKING"
+        # Extract ingredients and method from remaining lines
         else:
-            doc.metadata["recipe_type"] = "COLD SAUCES"
-
-        # Create recipe chunk
-        recipe_chunks.append({
-            "recipe_header": recipe_header.strip(),
-            "serving_suggestion": serving_suggestion.strip(),
-            "ingredients": ingredients,
-            "method": method,
-            "chef_tip": chef_tip,
-            "metadata": doc.metadata
-        })
+            ingredient_parts.append(left)
+            if right is not None:
+                if ':' in right:
+                    method_parts.append("\n" + right + "\n")
+                else:
+                    method_parts.append(right + " ")
+
+    # Join collected lines and clean up extracted content
+    recipe_header = " ".join(header_parts).strip()
+    serving_suggestion = " ".join(serving_parts).strip()
+    ingredients = "\n".join(ingredient_parts).replace("INGREDIENTS", "").strip()
+    
+    # Extract chef's tip if present
+    method, separator, chef_tip = "".join(method_parts).partition("CHEF'S TIP:")
+    method = method.replace("METHOD", "").strip()
+    if separator:
+        chef_tip = chef_tip.replace("\n", " ").strip()
+
+    # Add recipe-specific metadata
+    doc.metadata["recipe_name"] = recipe_header
+    doc.metadata["serving_suggestion"] = serving_suggestion
+
+    # Categorize recipe type by page number
+    page_label = doc.metadata["page_label"]
+    doc.metadata["recipe_type"] = _RECIPE_TYPES[bisect_right(_PAGE_THRESHOLDS, page_label)]
+
+    # Create recipe chunk
+    return {
+        "recipe_header": recipe_header,
+        "serving_suggestion": serving_suggestion,
+        "ingredients": ingredients,
+        "method": method,
+        "chef_tip": chef_tip,
+        "metadata": doc.metadata
+    }
+
+
+def split_into_chunks(documents):
+    """
+    Parse recipe pages into recipe chunks
+
+    Pages are parsed serially as they stream in. Only pages beyond the first
+    _PARALLEL_MIN_PAGES are handed to worker processes, since a single page
+    parses in tens of microseconds and starting a process pool costs
+    milliseconds with fork and hundreds of milliseconds with spawn.
+    """
+    documents = iter(documents)
+    recipe_chunks = [
+        chunk for chunk in map(_parse_page, islice(documents, _PARALLEL_MIN_PAGES))
+        if chunk is not None
+    ]
+
+    remaining = list(documents)
+    if remaining:
+        # Large chunks amortize the cost of shipping pages to the workers
+        chunksize = max(1, len(remaining) // (4 * (os.cpu_count() or 1)))
+        with ProcessPoolExecutor() as executor:
+            parsed = executor.map(_parse_page, remaining, chunksize=chunksize)
+            recipe_chunks.extend(chunk for chunk in parsed if chunk is not None)
 
     return recipe_chunks
 
 
 if __name__ == "__main__":
-    documents = load_pdf_documents(DATASET_PATH)
-    print(f"Loaded {len(documents)} documents from {DATASET_PATH}")
-    print(f"First document content:\n{documents[7].page_content}...\n")
-    print(f"First document metadata:\n{documents[7].metadata}...\n")
+    documents = list(load_pdf_documents(DATASET_PATH))
+    print(f"Loaded {len(documents)} recipe pages from {DATASET_PATH}")
+    print(f"First document content:\n{documents[0].page_content}...\n")
+    print(f"First document metadata:\n{documents[0].metadata}...\n")
 
     recipe_chunks = split_into_chunks(documents)
     print(f"Extracted {len(recipe_chunks)} recipe chunks")
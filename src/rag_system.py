@@ -14,6 +14,23 @@ load_dotenv()
 ANTHROPIC_API_KEY = os.getenv('CLAUDE_API_KEY')
 anthropic_client = Anthropic(api_key=ANTHROPIC_API_KEY)
 
+# Template for each recipe passed to Claude as context
+_RECIPE_TEMPLATE = (
+    "\n"
+    "Recipe {i}: {metadata[recipe_name]}\n"
+    "Type: {metadata[recipe_type]}\n"
+    "Serving: {metadata[serving_suggestion]}\n"
+    "Relevance Score: {score:.2f}\n"
+    "\n"
+    "INGREDIENTS:\n"
+    "{metadata[ingredients]}\n"
+    "\n"
+    "METHOD:\n"
+    "{method_preview}\n"
+    "{chef_tip}"
+    "\n" + "=" * 80 + "\n"
+)
+
 
 class RecipeRAG:
     """Main RAG system for recipe recommendations"""
@@ -72,32 +89,31 @@ class RecipeRAG:
         if not search_results or not search_results['matches']:
             return "No matching recipes found."
         
-        formatted_recipes = []
+        return "\n".join(
+            _RECIPE_TEMPLATE.format_map(self._recipe_fields(i, match))
+            for i, match in enumerate(search_results['matches'], 1)
+        )
+    
+    def _recipe_fields(self, i, match):
+        """Collect the template fields for a single search match"""
+        metadata = match['metadata']
         
-        for i, match in enumerate(search_results['matches'], 1):
-            metadata = match['metadata']
-            score = match['score']
-            
-            recipe_text = f"""
-            Recipe {i}: {metadata['recipe_name']}
-            Type: {metadata['recipe_type']}
-            Serving: {metadata['serving_suggestion']}
-            Relevance Score: {score:.2f}
-            
-            INGREDIENTS:
-            {metadata['ingredients']}
-            
-            METHOD:
-            {metadata['method'][:500]}{'...' if len(metadata['method']) > 500 else ''}
-            """
-            
-            if metadata.get('chef_tip'):
-                recipe_text += f"\nCHEF'S TIP: {metadata['chef_tip']}\n"
-            
-            recipe_text += "\n" + "="*80 + "\n"
-            formatted_recipes.append(recipe_text)
+        # Vectors uploaded before method_preview existed only carry the method
+        method_preview = metadata.get('method_preview')
+        if method_preview is None:
+            method = metadata['method']
+            method_preview = method[:500] + ('...' if len(method) > 500 else '')
+        
+        chef_tip = metadata.get('chef_tip')
         
-        return "\n".join(formatted_recipes)
+        # Plain metadata fields are looked up by the template itself
+        return {
+            "i": i,
+            "metadata": metadata,
+            "score": match['score'],
+            "method_preview": method_preview,
+            "chef_tip": f"\nCHEF'S TIP: {chef_tip}\n" if chef_tip else "",
+        }
     
     def create_prompt(self, user_ingredients: str, retrieved_recipes: str, user_query: str = None):
         """
@@ -2,15 +2,32 @@
 Test script for Recipe RAG System
 """
 
+import os
+import sys
+from functools import lru_cache
+
 from rag_system import RecipeRAG
 
+
+@lru_cache(maxsize=1)
+def _get_rag():
+    """Create the RAG system once and share it across tests"""
+    return RecipeRAG()
+
+
+def _pause():
+    """Wait for Enter between tests, unless running headless (no TTY, CI or BENCH set)"""
+    if sys.stdin.isatty() and not os.getenv('CI') and not os.getenv('BENCH'):
+        input("\nPress Enter to continue to next test...")
+
+
 def test_basic_query():
     """Test basic ingredient query"""
     print("\n" + "="*80)
     print("TEST 1: Basic Ingredient Query")
     print("="*80)
     
-    rag = RecipeRAG()
+    rag = _get_rag()
     
     # Test query
     ingredients = "chicken, rice, garlic"
@@ -31,7 +48,7 @@ def test_filtered_query():
     print("TEST 2: Filtered Query (Desserts)")
     print("="*80)
     
-    rag = RecipeRAG()
+    rag = _get_rag()
     
     # Test query with filter
     ingredients = "chocolate, butter, flour"
@@ -58,7 +75,7 @@ def test_additional_requirements():
     print("TEST 3: Query with Additional Requirements")
     print("="*80)
     
-    rag = RecipeRAG()
+    rag = _get_rag()
     
     # Test query with additional request
     ingredients = "beef, onion, tomato"
@@ -87,10 +104,10 @@ if __name__ == "__main__":
     # Run tests
     try:
         test_basic_query()
-        input("\nPress Enter to continue to next test...")
+        _pause()
         
         test_filtered_query()
-        input("\nPress Enter to continue to next test...")
+        _pause()
         
         test_additional_requirements()
         
@@ -12,6 +12,18 @@ load_dotenv()
 DATASET_PATH = os.getenv('DATASET_PATH')
 
 
+def deduplicate_recipes(recipe_chunks):
+    """Drop recipes whose ingredients and method exactly match an earlier one"""
+    seen = set()
+    unique_chunks = []
+    for recipe in recipe_chunks:
+        key = (recipe['ingredients'], recipe['method'])
+        if key not in seen:
+            seen.add(key)
+            unique_chunks.append(recipe)
+    return unique_chunks
+
+
 def main():
     """Main pipeline: Load PDF -> Extract recipes -> Upload to Pinecone"""
     
@@ -19,16 +31,22 @@ def main():
     print("RECIPE RAG SYSTEM - UPLOAD PIPELINE")
     print("=" * 50)
     
-    # Load PDF documents
+    # Load PDF documents (pages are streamed into the extraction step)
     print("\n[1/4] Loading PDF documents...")
     documents = load_pdf_documents(DATASET_PATH)
-    print(f"✅ Loaded {len(documents)} pages from {DATASET_PATH}")
+    print(f"✅ Streaming recipe pages from {DATASET_PATH}")
     
     # Extract recipe chunks
     print("\n[2/4] Extracting recipe chunks...")
     recipe_chunks = split_into_chunks(documents)
     print(f"✅ Extracted {len(recipe_chunks)} recipe chunks")
     
+    # Skip duplicate pages before the expensive embedding step
+    unique_chunks = deduplicate_recipes(recipe_chunks)
+    if len(unique_chunks) < len(recipe_chunks):
+        print(f"Skipped {len(recipe_chunks) - len(unique_chunks)} duplicate recipes")
+    recipe_chunks = unique_chunks
+    
     # Display sample recipe
     if recipe_chunks:
         sample = recipe_chunks[0]
@@ -66,13 +84,9 @@ def main():
             print("Upload cancelled.")
             return
     
+    # upload_recipes waits until the new vectors are indexed
     vector_store.upload_recipes(recipe_chunks, batch_size=100)
     
-    # Wait a bit more to ensure indexing is complete
-    print("\n⏳ Waiting additional time for indexing to fully complete...")
-    import time
-    time.sleep(10)
-    
     # Final stats
     print("\n" + "=" * 60)
     print("UPLOAD COMPLETE!")
@@ -1,20 +1,117 @@
 import os
+import hashlib
+import shelve
+import numpy as np
 from dotenv import load_dotenv
-from pinecone import Pinecone, ServerlessSpec
-from sentence_transformers import SentenceTransformer
 from typing import List, Dict
 import time
+from functools import lru_cache
+from concurrent.futures import Future, ThreadPoolExecutor
+from tqdm import tqdm
 
 load_dotenv()
 
 # Load environment variables
 PINECONE_API_KEY = os.getenv('PINECONE_API_KEY')
 INDEX_NAME = "recipe-index"
+EMBEDDING_MODEL_NAME = 'all-MiniLM-L6-v2'
+# Dynamically quantized 8-bit ONNX export shipped with the model (AVX2 kernels, uint8
+# weights; use onnx/model_qint8_avx512_vnni.onnx or onnx/model_qint8_arm64.onnx where
+# available). A file name the model doesn't ship makes sentence-transformers re-export
+# an unquantized FP32 graph on every load
+EMBEDDING_ONNX_FILE = os.getenv('EMBEDDING_ONNX_FILE', 'onnx/model_quint8_avx2.onnx')
+# Local copy of the model files, downloaded once and loaded offline afterwards
+EMBEDDING_MODEL_DIR = os.getenv('EMBEDDING_MODEL_DIR', 'models')
+EMBEDDING_CACHE_PATH = os.getenv('EMBEDDING_CACHE_PATH', 'embedding_cache')
+# Recipes embedded per step of the upload pipeline
+EMBED_CHUNK_SIZE = 256
 
-# Initialize embedding model
-print("Loading embedding model...")
-embedding_model = SentenceTransformer('all-MiniLM-L6-v2')
-print("Embedding model loaded successfully!")
+# Roughly the model's 256-token input limit in characters
+SEARCHABLE_TEXT_MAX_CHARS = 1200
+
+# Maps line breaks and tabs to spaces when building searchable text
+_WHITESPACE_TABLE = str.maketrans('\n\r\t', '   ')
+
+
+# Heavy libraries are imported on first use, so stats and deletion skip them.
+# Fully cached uploads never load the model, but still import torch to pick
+# the variant that is part of every cache key
+@lru_cache(maxsize=1)
+def _embedding_variant() -> str:
+    """FP16 PyTorch on GPU when available, int8 ONNX on CPU otherwise"""
+    import torch
+    return "cuda-fp16" if torch.cuda.is_available() else EMBEDDING_ONNX_FILE
+
+
+def _download_model(model_path: str, variant: str):
+    """Download the embedding model files needed for variant into model_path"""
+    from huggingface_hub import hf_hub_download, snapshot_download
+    
+    repo_id = f"sentence-transformers/{EMBEDDING_MODEL_NAME}"
+    print(f"Downloading embedding model into {model_path}...")
+    # Skip the exports for other frameworks; the ONNX file in use is fetched on its own
+    snapshot_download(
+        repo_id,
+        local_dir=model_path,
+        ignore_patterns=["onnx/*", "openvino/*", "*.h5", "*.msgpack", "*.ot", "pytorch_model.bin"]
+    )
+    if variant != "cuda-fp16":
+        hf_hub_download(repo_id, variant, local_dir=model_path)
+
+
+@lru_cache(maxsize=1)
+def _get_model():
+    """Load the embedding model once"""
+    from sentence_transformers import SentenceTransformer
+    
+    print("Loading embedding model...")
+    variant = _embedding_variant()
+    if variant == "cuda-fp16":
+        load_kwargs = {"device": 'cuda'}
+        weights_file = "model.safetensors"
+    else:
+        load_kwargs = {"backend": "onnx", "model_kwargs": {"file_name": variant}}
+        weights_file = variant
+    
+    # First run: download into EMBEDDING_MODEL_DIR. Later runs load the local
+    # directory, which sentence-transformers reads without contacting the
+    # Hugging Face Hub; PyTorch weights come from safetensors, which are
+    # memory-mapped rather than unpickled
+    model_path = os.path.join(EMBEDDING_MODEL_DIR, EMBEDDING_MODEL_NAME)
+    if not os.path.isfile(os.path.join(model_path, weights_file)):
+        _download_model(model_path, variant)
+    
+    model = SentenceTransformer(model_path, **load_kwargs)
+    
+    if variant == "cuda-fp16":
+        model.half()
+    print(f"Embedding model loaded successfully! ({variant})")
+    return model
+
+
+@lru_cache(maxsize=1024)
+def _encode_query(query: str) -> tuple:
+    """Embed and L2-normalize a search query, reusing the result for repeated queries"""
+    return tuple(_get_model().encode(query, normalize_embeddings=True).tolist())
+
+
+def _wait_until(condition, timeout: float = 60, initial_delay: float = 0.5, max_delay: float = 5) -> bool:
+    """
+    Poll condition with exponential backoff until it holds or timeout expires
+    
+    Returns:
+        True if the condition was met, False on timeout
+    """
+    deadline = time.monotonic() + timeout
+    delay = initial_delay
+    while True:
+        if condition():
+            return True
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return False
+        time.sleep(min(delay, remaining))
+        delay = min(delay * 2, max_delay)
 
 
 class RecipeVectorStore:
@@ -23,17 +120,27 @@ class RecipeVectorStore:
     def __init__(self, index_name: str = INDEX_NAME):
         """Initialize Pinecone connection and index"""
         self.index_name = index_name
+        # Fail fast on a misconfigured environment, before any client or model is loaded
+        if not PINECONE_API_KEY:
+            raise RuntimeError("PINECONE_API_KEY missing - set it in your environment or .env file")
+        
+        # gRPC client: upserts are multiplexed over a single HTTP/2 channel
+        from pinecone.grpc import PineconeGRPC as Pinecone
+        
         self.pc = Pinecone(api_key=PINECONE_API_KEY)
         self.index = None
         
-    def create_index(self, dimension: int = 384, metric: str = "cosine"):
+    def create_index(self, dimension: int = 384, metric: str = "dotproduct"):
         """
         Create a new Pinecone index if it doesn't exist
         
         Args:
             dimension: Embedding dimension (384 for all-MiniLM-L6-v2)
-            metric: Distance metric (cosine, euclidean, or dotproduct)
+            metric: Distance metric (cosine, euclidean, or dotproduct); embeddings
+                are L2-normalized client-side, so dotproduct equals cosine similarity
         """
+        from pinecone import ServerlessSpec
+        
         try:
             existing_indexes = [index.name for index in self.pc.list_indexes()]
             
@@ -54,7 +161,8 @@ class RecipeVectorStore:
                 
                 # Wait for index to be ready
                 print("Waiting for index to be ready...")
-                time.sleep(10)
+                if not _wait_until(lambda: self.pc.describe_index(self.index_name).status['ready']):
+                    print("⚠️  Index is not ready yet; continuing anyway")
         except Exception as e:
             if "ALREADY_EXISTS" in str(e):
                 print(f"Index '{self.index_name}' already exists (confirmed via error). Continuing...")
@@ -83,36 +191,48 @@ class RecipeVectorStore:
         Returns:
             Combined searchable text
         """
-        parts = []
-        
-        # Recipe name 
-        recipe_name = recipe['metadata'].get('recipe_name', recipe['recipe_header'])
-        parts.append(f"{recipe_name} {recipe_name}")
+        metadata = recipe['metadata']
+        recipe_name = metadata.get('recipe_name', recipe['recipe_header'])
         
-        # Recipe type
-        recipe_type = recipe['metadata'].get('recipe_type', '')
-        if recipe_type:
-            parts.append(recipe_type)
+        # Name leads the text so it is never cut off; line breaks become spaces
+        fields = (
+            recipe_name,
+            metadata.get('recipe_type', ''),
+            (recipe.get('ingredients') or '').translate(_WHITESPACE_TABLE).strip(),
+            (recipe.get('method') or '')[:500].translate(_WHITESPACE_TABLE).strip(),
+            recipe.get('chef_tip', ''),
+        )
+        text = ' '.join(field for field in fields if field)
         
-        # Ingredients 
-        ingredients = recipe.get('ingredients', '')
-        if ingredients:
-            # Clean ingredients text
-            ingredients_clean = ingredients.replace('\n', ' ').strip()
-            parts.append(ingredients_clean)
+        # The model only reads its first 256 tokens; don't tokenize text it would drop
+        return text[:SEARCHABLE_TEXT_MAX_CHARS]
+    
+    def create_metadata(self, recipe: Dict) -> Dict:
+        """
+        Create the Pinecone metadata stored alongside a recipe vector
         
-        # Method
+        Args:
+            recipe: Recipe chunk dictionary
+            
+        Returns:
+            Metadata dictionary truncated to Pinecone's size limits
+        """
+        recipe_metadata = recipe['metadata']
         method = recipe.get('method', '')
-        if method:
-            method_preview = method[:500].replace('\n', ' ').strip()
-            parts.append(method_preview)
         
-        # Chef tips if available
-        chef_tip = recipe.get('chef_tip', '')
-        if chef_tip:
-            parts.append(chef_tip)
-        
-        return ' '.join(parts)
+        return {
+            "recipe_name": recipe_metadata.get('recipe_name', '')[:200],
+            "recipe_type": recipe_metadata.get('recipe_type', '')[:100],
+            "serving_suggestion": recipe.get('serving_suggestion', '')[:100],
+            "ingredients": recipe.get('ingredients', '')[:2000],
+            "method": method[:2000],
+            # Preview shown in the RAG context, computed once here instead of per query
+            "method_preview": method[:500] + ('...' if len(method) > 500 else ''),
+            "chef_tip": recipe.get('chef_tip', '')[:500],
+            "page": int(recipe_metadata.get('page', 0)),
+            "page_label": recipe_metadata.get('page_label', ''),
+            "source": recipe_metadata.get('source', '')
+        }
     
     def generate_embedding(self, text: str) -> List[float]:
         """
@@ -124,16 +244,82 @@ class RecipeVectorStore:
         Returns:
             Embedding vector as list of floats
         """
-        embedding = embedding_model.encode(text)
+        embedding = _get_model().encode(text)
         return embedding.tolist()
     
-    def upload_recipes(self, recipe_chunks: List[Dict], batch_size: int = 10):
+    def embed_texts(self, texts: List[str]) -> np.ndarray:
+        """
+        Embed texts in one batch, reusing vectors cached by previous runs
+        
+        Args:
+            texts: Texts to embed
+            
+        Returns:
+            Matrix of normalized embeddings, one row per text
+        """
+        keys = [
+            hashlib.blake2b(f"{EMBEDDING_MODEL_NAME}/{_embedding_variant()}\0{text}".encode(), digest_size=16).hexdigest()
+            for text in texts
+        ]
+        
+        with shelve.open(EMBEDDING_CACHE_PATH) as cache:
+            # Resolve each distinct text once, so duplicates share a single encode
+            found = {}
+            missing = {}
+            for key, text in zip(keys, texts):
+                if key in found or key in missing:
+                    continue
+                embedding = cache.get(key)
+                if embedding is None:
+                    missing[key] = text
+                else:
+                    found[key] = embedding
+            
+            if missing:
+                print(f"Embedding {len(missing)} new texts ({len(found)} cached)...")
+                # encode() already sorts texts by length so each batch pads little
+                new_embeddings = _get_model().encode(
+                    list(missing.values()),
+                    batch_size=64,
+                    convert_to_numpy=True,
+                    show_progress_bar=True
+                )
+                for key, embedding in zip(missing, new_embeddings):
+                    cache[key] = embedding
+                    found[key] = embedding
+        
+        embeddings = np.array([found[key] for key in keys], dtype=np.float32)
+        
+        # L2-normalize all rows at once
+        if len(embeddings):
+            embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True).clip(min=1e-12)
+        return embeddings
+    
+    def _send_upsert(self, vectors: List[Dict]):
+        """
+        Start an asynchronous upsert of one batch
+        
+        Args:
+            vectors: Batch of vectors to upsert
+            
+        Returns:
+            Future for the upsert; a batch that could not be sent gets a failed
+            future so it is reported with the other upload errors
+        """
+        try:
+            return self.index.upsert(vectors=vectors, async_req=True)
+        except Exception as e:
+            failed = Future()
+            failed.set_exception(e)
+            return failed
+    
+    def upload_recipes(self, recipe_chunks: List[Dict], batch_size: int = 100):
         """
         Upload recipe chunks to Pinecone vector database
         
         Args:
             recipe_chunks: List of recipe chunk dictionaries
-            batch_size: Number of vectors to upload per batch
+            batch_size: Number of vectors per upsert request (batches are sent concurrently)
         """
         if not self.index:
             print("Error: Not connected to index. Call connect_to_index() first.")
@@ -141,61 +327,76 @@ class RecipeVectorStore:
         
         print(f"\nStarting upload of {len(recipe_chunks)} recipes...")
         
-        vectors_to_upsert = []
+        # Each batch is allocated at full size and filled in place; a fresh list is
+        # needed per batch because sent batches stay in flight asynchronously
+        vectors_to_upsert = [None] * batch_size
+        filled = 0
+        pending_upserts = []
         successful_uploads = 0
+        last_uploaded = None
         
-        for i, recipe in enumerate(recipe_chunks):
-            try:
-                # Create searchable text
-                searchable_text = self.create_searchable_text(recipe)
-                
-                # Generate embedding
-                embedding = self.generate_embedding(searchable_text)
-                
-                # Prepare metadata (Pinecone has metadata size limits)
-                metadata = {
-                    "recipe_name": recipe['metadata'].get('recipe_name', '')[:200],
-                    "recipe_type": recipe['metadata'].get('recipe_type', '')[:100],
-                    "serving_suggestion": recipe.get('serving_suggestion', '')[:100],
-                    "ingredients": recipe.get('ingredients', '')[:2000],  # Truncate if too long
-                    "method": recipe.get('method', '')[:2000],
-                    "chef_tip": recipe.get('chef_tip', '')[:500],
-                    "page": int(recipe['metadata'].get('page', 0)),
-                    "page_label": recipe['metadata'].get('page_label', ''),
-                    "source": recipe['metadata'].get('source', '')
-                }
-                
-                # Create vector ID
-                vector_id = f"recipe_page_{recipe['metadata'].get('page', i)}"
-                
-                # Add to batch
-                vectors_to_upsert.append({
-                    "id": vector_id,
-                    "values": embedding,
-                    "metadata": metadata
-                })
-                
-                # Upload batch when it reaches batch_size
-                if len(vectors_to_upsert) >= batch_size:
-                    self.index.upsert(vectors=vectors_to_upsert)
-                    successful_uploads += len(vectors_to_upsert)
-                    print(f"Uploaded batch: {successful_uploads}/{len(recipe_chunks)} recipes")
-                    vectors_to_upsert = []
+        # Embed recipes chunk by chunk, skipping cached ones; upserts of earlier
+        # chunks stream over gRPC while the next chunk is encoded
+        for chunk_start in range(0, len(recipe_chunks), EMBED_CHUNK_SIZE):
+            chunk = recipe_chunks[chunk_start:chunk_start + EMBED_CHUNK_SIZE]
+            texts = [self.create_searchable_text(recipe) for recipe in chunk]
+            embeddings = self.embed_texts(texts)
+            
+            # Convert the whole matrix in one call rather than one row at a time
+            for i, (recipe, embedding) in enumerate(zip(chunk, embeddings.tolist()), chunk_start):
+                try:
+                    metadata = self.create_metadata(recipe)
+                    
+                    # Create vector ID
+                    vector_id = f"recipe_page_{recipe['metadata'].get('page', i)}"
+                    
+                    # Add to batch
+                    vectors_to_upsert[filled] = {
+                        "id": vector_id,
+                        "values": embedding,
+                        "metadata": metadata
+                    }
+                    filled += 1
+                    
+                except Exception as e:
+                    print(f"Error processing recipe {i}: {e}")
+                    continue
                 
-            except Exception as e:
-                print(f"Error processing recipe {i}: {e}")
-                continue
+                # Send batch in the background when it reaches batch_size
+                if filled == batch_size:
+                    pending_upserts.append((vectors_to_upsert, self._send_upsert(vectors_to_upsert)))
+                    vectors_to_upsert = [None] * batch_size
+                    filled = 0
         
         # Upload remaining vectors
-        if vectors_to_upsert:
-            self.index.upsert(vectors=vectors_to_upsert)
-            successful_uploads += len(vectors_to_upsert)
+        if filled:
+            vectors_to_upsert = vectors_to_upsert[:filled]
+            pending_upserts.append((vectors_to_upsert, self._send_upsert(vectors_to_upsert)))
+        
+        # Wait for all in-flight upserts; a failed batch is reported and skipped
+        with tqdm(total=len(recipe_chunks), desc="Uploading", unit="recipe") as progress:
+            for batch, upsert_future in pending_upserts:
+                try:
+                    upsert_future.result()
+                    successful_uploads += len(batch)
+                    last_uploaded = batch[-1]
+                except Exception as e:
+                    tqdm.write(f"Error uploading batch of {len(batch)} recipes: {e}")
+                progress.update(len(batch))
         
         print(f"\n✅ Upload complete! Successfully uploaded {successful_uploads}/{len(recipe_chunks)} recipes")
         
-        # Wait for indexing to complete
-        print("\n⏳ Waiting for Pinecone to index vectors (this may take 10-30 seconds)...")
-        time.sleep(15)
+        # Wait until the last uploaded vector is readable with the metadata just sent;
+        # vector counts can't tell a re-upload apart from the vectors it overwrites
+        if last_uploaded:
+            print("\n⏳ Waiting for Pinecone to index vectors...")
+            
+            def is_indexed():
+                fetched = self.index.fetch(ids=[last_uploaded['id']]).vectors.get(last_uploaded['id'])
+                return fetched is not None and dict(fetched.metadata) == last_uploaded['metadata']
+            
+            if not _wait_until(is_indexed):
+                print("⚠️  Indexing is still in progress; counts below may be incomplete")
         
         # Verify upload
         stats = self.index.describe_index_stats()
@@ -220,7 +421,7 @@ class RecipeVectorStore:
             return None
         
         # Generate query embedding
-        query_embedding = self.generate_embedding(query)
+        query_embedding = list(_encode_query(query))
         
         # Search
         results = self.index.query(
@@ -232,6 +433,42 @@ class RecipeVectorStore:
         
         return results
     
+    def search_recipes_batch(self, queries: List[str], top_k: int = 5, filter_dict: Dict = None):
+        """
+        Search for recipes for several queries at once
+        
+        Args:
+            queries: List of search queries
+            top_k: Number of results to return per query
+            filter_dict: Optional metadata filters applied to every query
+            
+        Returns:
+            List of search results, in the same order as queries
+        """
+        if not self.index:
+            print("Error: Not connected to index. Call connect_to_index() first.")
+            return None
+        
+        if not queries:
+            return []
+        
+        # Embed all queries in a single batched forward pass
+        query_embeddings = _get_model().encode(queries, batch_size=32, normalize_embeddings=True)
+        
+        def query_index(query_embedding):
+            return self.index.query(
+                vector=query_embedding.tolist(),
+                top_k=top_k,
+                include_metadata=True,
+                filter=filter_dict
+            )
+        
+        # Issue the queries concurrently so latency is the slowest query, not the sum
+        with ThreadPoolExecutor(max_workers=min(len(queries), 16)) as executor:
+            results = list(executor.map(query_index, query_embeddings))
+        
+        return results
+    
     def delete_all_vectors(self):
         """Delete all vectors from the index (use with caution!)"""
         if not self.index: